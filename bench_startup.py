@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Startup benchmark for the opendata module.
+
+Measures, in fresh interpreter processes, the time needed to import
+opendata and the latency of the first request against the local stub
+(see opendata_stub.py). Results are printed as a JSON object; pass
+--output FILE to append them to a file, so that they can be tracked
+over time.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from opendata_stub import start_stub
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a child process; prints the timings as JSON
+CHILD_SCRIPT = '''
+import json, sys, time
+t0 = time.time()
+import opendata
+t1 = time.time()
+lazy = 'requests' not in sys.modules
+opendata.OpendataClient(sys.argv[1]).get_decision('ADA')
+t2 = time.time()
+print(json.dumps({'import': t1 - t0, 'first_request': t2 - t1, 'lazy': lazy}))
+'''
+
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def run(runs):
+    server, root = start_stub()
+    try:
+        samples = []
+        for _ in range(runs):
+            out = subprocess.check_output(
+                [sys.executable, '-c', CHILD_SCRIPT, root], cwd=HERE)
+            samples.append(json.loads(out.decode('utf-8')))
+    finally:
+        server.shutdown()
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'runs': runs,
+        'import_ms': round(_median([s['import'] for s in samples]) * 1000, 2),
+        'first_request_ms': round(
+            _median([s['first_request'] for s in samples]) * 1000, 2),
+        'lazy_import': all(s['lazy'] for s in samples),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--output', help='append the results to this file')
+    args = parser.parse_args()
+
+    result = run(args.runs)
+    line = json.dumps(result, sort_keys=True)
+    print(line)
+    if args.output:
+        out_file = open(args.output, 'a')
+        out_file.write(line + '\n')
+        out_file.close()
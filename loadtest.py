@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Load and soak test harness for the opendata client.
+
+Drives a configurable mix of read and write operations through a single
+shared OpendataClient at a target request rate, by default against the
+local stub (see opendata_stub.py), which is started in a separate process
+so that it does not skew the measurements of the client. Every interval
+it prints throughput, p50/p95/p99 latency, error rate, resident memory
+and open file descriptors of the client process; at the end it prints
+per-operation totals and warns if file descriptors or memory kept
+growing, which usually means a leak (e.g. unclosed upload file handlers).
+
+Latency is measured from the time each request was scheduled, so that
+a client that falls behind the target rate shows up in the percentiles.
+The number of requests in flight is bounded: requests that are due while
+the client is saturated are dropped and counted, rather than queued, so
+that the backlog of the harness does not show up as client memory.
+
+Example:
+    python loadtest.py --rate 200 --duration 600 --mix get_decision=6,search=2,submit=1
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import opendata
+from opendata_stub import ROOT_PATH
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = ('get_decision=40,search=20,organization=15,'
+               'submit=10,edit=10,revoke=5')
+
+# Latencies kept per operation for the final percentiles; a random sample
+# of this size keeps the memory of the harness itself flat in long runs
+RESERVOIR_SIZE = 10000
+
+
+def _sample_metadata():
+    json_file = open(os.path.join(HERE, 'SampleDecisionMetadata.json'), 'r')
+    metadata = json.load(json_file)
+    json_file.close()
+    return metadata
+
+
+def _open(name):
+    return open(os.path.join(HERE, name), 'rb')
+
+
+def op_get_decision(client, metadata):
+    return client.get_decision('ADA-{0}'.format(random.randint(0, 9999)))
+
+
+def op_search(client, metadata):
+    return client.get_simple_search_results(
+        org=metadata['organizationId'], size=10)
+
+
+def op_organization(client, metadata):
+    return client.get_organization(metadata['organizationId'])
+
+
+def op_submit(client, metadata):
+    pdf_file = _open('SampleDecision.pdf')
+    att = _open('Attachment.docx')
+    try:
+        return client.submit_decision(metadata, pdf_file, [(att, 'Attachment')])
+    finally:
+        pdf_file.close()
+        att.close()
+
+
+def op_edit(client, metadata):
+    return client.edit_published_decision('ADA-EDIT', metadata)
+
+
+def op_revoke(client, metadata):
+    return client.submit_revocation_request('ADA-REVOKE', 'load test')
+
+
+OPERATIONS = {
+    'get_decision': op_get_decision,
+    'search': op_search,
+    'organization': op_organization,
+    'submit': op_submit,
+    'edit': op_edit,
+    'revoke': op_revoke,
+}
+
+
+def succeeded(result):
+    """Write operations return a response; read operations return the JSON
+    body, which holds an errors list when the API rejected the request."""
+    if hasattr(result, 'status_code'):
+        return result.status_code < 400
+    return not (isinstance(result, dict) and 'errors' in result)
+
+
+def parse_mix(mix):
+    """Parses 'name=weight,...' into a list of (name, weight) tuples."""
+    result = []
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError('Unknown operation: ' + name)
+        result.append((name, float(weight or 1)))
+    return result
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = int(math.ceil(pct / 100.0 * len(values))) - 1
+    return values[max(0, min(rank, len(values) - 1))]
+
+
+def process_stats():
+    """Returns (resident memory in MB, open file descriptors) of this
+    process; None for values that cannot be determined on this platform.
+    """
+    rss = fds = None
+    try:
+        statm = open('/proc/self/statm')
+        pages = int(statm.read().split()[1])
+        statm.close()
+        rss = pages * os.sysconf('SC_PAGE_SIZE') / (1024.0 * 1024.0)
+        fds = len(os.listdir('/proc/self/fd'))
+    except (IOError, OSError):
+        try:
+            import resource
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            # Peak rather than current; kilobytes on Linux, bytes on macOS
+            rss = usage.ru_maxrss / (1024.0 if sys.platform != 'darwin'
+                                     else 1024.0 * 1024.0)
+        except ImportError:
+            pass
+    return rss, fds
+
+
+def spawn_stub():
+    """Starts opendata_stub.py in a child process and returns
+    (process, root_url) once it accepts connections."""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    devnull = open(os.devnull, 'w')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, 'opendata_stub.py'), str(port)],
+        stdout=devnull)
+    devnull.close()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            break
+        except socket.error:
+            time.sleep(0.05)
+    return process, 'http://127.0.0.1:{0}{1}'.format(port, ROOT_PATH)
+
+
+class Recorder(object):
+    """Collects request outcomes, per interval and in total."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._interval = []
+        self._interval_dropped = 0
+        self.totals = {}
+        self.dropped = 0
+
+    def drop(self):
+        with self._lock:
+            self._interval_dropped += 1
+            self.dropped += 1
+
+    def record(self, name, latency, ok):
+        with self._lock:
+            self._interval.append((latency, ok))
+            totals = self.totals.setdefault(name, [0, 0, []])
+            totals[0] += 1
+            if not ok:
+                totals[1] += 1
+            latencies = totals[2]
+            if len(latencies) < RESERVOIR_SIZE:
+                latencies.append(latency)
+            else:
+                i = random.randint(0, totals[0] - 1)
+                if i < RESERVOIR_SIZE:
+                    latencies[i] = latency
+
+    def take_interval(self):
+        """Returns the (latency, ok) samples and the number of dropped
+        requests since the previous call."""
+        with self._lock:
+            samples, self._interval = self._interval, []
+            dropped, self._interval_dropped = self._interval_dropped, 0
+        return samples, dropped
+
+
+def _summary(latencies, errors, count, seconds):
+    latencies = sorted(latencies)
+    return {
+        'requests': count,
+        'throughput': round(count / seconds, 1) if seconds else 0.0,
+        'errors': errors,
+        'error_rate': round(float(errors) / count, 4) if count else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def run(client, mix, rate, duration, threads, interval, report,
+        max_in_flight=None):
+    """Runs the load test and returns the list of interval reports, a dict
+    with the summary of every operation and a dict with the number of
+    requests that were dropped because the client was saturated and of
+    queued requests that were cancelled when the duration ran out.
+
+    report is called with every interval report as soon as it is ready.
+    At most max_in_flight requests (default: twice the threads) are
+    running or queued at any time.
+    """
+    max_in_flight = max_in_flight or 2 * threads
+    metadata = _sample_metadata()
+    names = [name for name, _ in mix]
+    total_weight = sum(weight for _, weight in mix)
+    recorder = Recorder()
+    reports = []
+
+    def choose():
+        r = random.uniform(0, total_weight)
+        for name, weight in mix:
+            r -= weight
+            if r <= 0:
+                return name
+        return names[-1]
+
+    def call(name, scheduled):
+        try:
+            ok = succeeded(OPERATIONS[name](client, metadata))
+        except Exception:
+            ok = False
+        recorder.record(name, time.time() - scheduled, ok)
+
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+
+    def done(future):
+        with in_flight_lock:
+            in_flight.discard(future)
+
+    executor = ThreadPoolExecutor(threads)
+    start = time.time()
+    last_report = start
+    next_report = start + interval
+    slot = 0
+    cancelled = 0
+    try:
+        while True:
+            now = time.time()
+            if now >= next_report or now - start >= duration:
+                samples, dropped = recorder.take_interval()
+                rss, fds = process_stats()
+                with in_flight_lock:
+                    pending = len(in_flight)
+                line = _summary([s[0] for s in samples],
+                                len([s for s in samples if not s[1]]),
+                                len(samples), now - last_report)
+                line.update({'elapsed': round(now - start, 1),
+                             'rss_mb': rss and round(rss, 1), 'open_fds': fds,
+                             'pending': pending, 'dropped': dropped})
+                reports.append(line)
+                report(line)
+                last_report = now
+                # Skip the intervals that were missed while falling behind
+                while next_report <= now:
+                    next_report += interval
+            if now - start >= duration:
+                break
+            # Open-loop pacing: requests are issued at the target rate,
+            # regardless of how long the previous ones take
+            scheduled = start + slot / float(rate)
+            if scheduled > now:
+                time.sleep(max(0, min(scheduled - now, next_report - now)))
+                continue
+            slot += 1
+            with in_flight_lock:
+                saturated = len(in_flight) >= max_in_flight
+            if saturated:
+                recorder.drop()
+                continue
+            future = executor.submit(call, choose(), scheduled)
+            with in_flight_lock:
+                in_flight.add(future)
+            future.add_done_callback(done)
+    finally:
+        with in_flight_lock:
+            queued = list(in_flight)
+        for future in queued:
+            if future.cancel():
+                cancelled += 1
+        executor.shutdown(wait=True)
+    elapsed = time.time() - start
+    totals = dict((name, _summary(latencies, errors, count, elapsed))
+                  for name, (count, errors, latencies)
+                  in recorder.totals.items())
+    return reports, totals, {'dropped': recorder.dropped,
+                             'cancelled': cancelled}
+
+
+def detect_leaks(reports, fd_slack=10, rss_growth=0.5):
+    """Returns warnings if open file descriptors or memory grew steadily
+    between the first and the last third of the run."""
+    warnings = []
+    third = len(reports) // 3
+    if third < 1:
+        return warnings
+    first, last = reports[:third], reports[-third:]
+
+    def avg(rows, key):
+        values = [r[key] for r in rows if r[key] is not None]
+        return sum(values) / float(len(values)) if values else None
+
+    fds_first, fds_last = avg(first, 'open_fds'), avg(last, 'open_fds')
+    if fds_first is not None and fds_last - fds_first > fd_slack:
+        warnings.append('open file descriptors grew from {0:.0f} to {1:.0f}'
+                        .format(fds_first, fds_last))
+    rss_first, rss_last = avg(first, 'rss_mb'), avg(last, 'rss_mb')
+    if rss_first and rss_last > rss_first * (1 + rss_growth):
+        warnings.append('resident memory grew from {0:.1f} MB to {1:.1f} MB'
+                        .format(rss_first, rss_last))
+    return warnings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--root',
+        help='API root URL; by default a local stub is started')
+    parser.add_argument('--rate', type=float, default=50,
+        help='target requests per second')
+    parser.add_argument('--duration', type=float, default=60,
+        help='duration of the run in seconds')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--max-in-flight', type=int,
+        help='requests running or queued at most; later ones are dropped '
+             '(default: twice the threads)')
+    parser.add_argument('--interval', type=float, default=5,
+        help='reporting interval in seconds')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+        help='operation weights (default: %(default)s)')
+    parser.add_argument('--http2', action='store_true',
+        help='use the HTTP/2 transport (requires httpx[http2])')
+    parser.add_argument('--username', default='10599_api')
+    parser.add_argument('--password', default='User@10599')
+    parser.add_argument('--output',
+        help='also write the interval reports to this file, one JSON per line')
+    args = parser.parse_args()
+
+    stub = None
+    root = args.root
+    if root is None:
+        stub, root = spawn_stub()
+    transport = (opendata.Http2Transport(max_connections=args.threads)
+                 if args.http2 else opendata.RequestsTransport())
+    client = opendata.OpendataClient(root, transport,
+        credentials=(args.username, args.password))
+
+    out_file = open(args.output, 'a') if args.output else None
+
+    def report(line):
+        text = json.dumps(line, sort_keys=True)
+        print(text)
+        if out_file is not None:
+            out_file.write(text + '\n')
+            out_file.flush()
+
+    try:
+        reports, totals, saturation = run(client, parse_mix(args.mix),
+            args.rate, args.duration, args.threads, args.interval, report,
+            args.max_in_flight)
+    finally:
+        transport.close()
+        if out_file is not None:
+            out_file.close()
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+
+    print('')
+    for name in sorted(totals):
+        print('{0:<14} {1}'.format(name,
+                                   json.dumps(totals[name], sort_keys=True)))
+    if saturation['dropped'] or saturation['cancelled']:
+        print('Client saturated: {0} requests dropped, {1} queued requests '
+              'cancelled at the end'.format(saturation['dropped'],
+                                            saturation['cancelled']))
+    leaks = detect_leaks(reports)
+    for warning in leaks:
+        print('WARNING: possible leak, ' + warning)
+    sys.exit(1 if leaks else 0)
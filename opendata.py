@@ -16,8 +16,309 @@ in a production system and it breaks, it's your fault :)
 """
 
 import json
-import requests
-from requests.auth import HTTPBasicAuth
+import os
+import threading
+import weakref
+
+# Content codings requested from the API, most preferred first: zstd and
+# br shrink the large, repetitive JSON listings much more than gzip
+CONTENT_CODINGS = ('zstd', 'br', 'gzip', 'deflate')
+
+
+def _accept_encoding(decodable):
+    """Builds an Accept-Encoding value that lists the codings in the
+    comma-separated string decodable in the order of CONTENT_CODINGS,
+    using quality values to state the preference.
+    """
+    decodable = [c.strip() for c in decodable.split(',')]
+    codings = [c for c in CONTENT_CODINGS if c in decodable]
+    return ', '.join(c if i == 0 else '{0};q={1:.1f}'.format(c, 1 - i / 10.0)
+                     for i, c in enumerate(codings))
+
+
+class RequestsTransport(object):
+    """Default transport, based on the requests library.
+    
+    Keeps one requests.Session per thread, so that connections to the API
+    are pooled and reused without sharing a session (which requests does
+    not guarantee to be thread-safe) between threads. A session is closed
+    when its thread exits, so short-lived threads do not leave their
+    connections open.
+    
+    requests pulls in a large dependency graph, so it is only imported
+    when the first HTTP call is made; ``import opendata`` stays cheap for
+    short-lived scripts and the command line interface.
+    
+    A transport is any object with get/post/close/accept_encoding methods
+    like the ones below. auth is None or a (username, password) tuple for
+    HTTP Basic authentication, and files a sequence of (field name, file
+    object) tuples. Responses must provide:
+    
+    status_code: the HTTP status code
+    headers: the response headers, with case-insensitive names
+    content: the decoded body, as bytes
+    text: the decoded body, as a string
+    json(): the body parsed as JSON
+    raise_for_status(): raises an exception for 4xx and 5xx responses
+    
+    Write operations return the response itself to the caller, so it
+    should otherwise behave like a requests.Response, as httpx.Response
+    does.
+    """
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._holders = weakref.WeakSet()
+        self._lock = threading.Lock()
+    
+    def accept_encoding(self):
+        """Returns the value of the Accept-Encoding header: the content
+        codings that requests decodes transparently, by preference. These
+        are gzip and deflate, br when brotli is installed and zstd when
+        backports.zstd is installed (or on Python 3.14+).
+        """
+        return _accept_encoding(
+            self._get_session().headers['Accept-Encoding'])
+    
+    def get(self, url, headers=None, auth=None):
+        return self._get_session().get(url, headers=headers, auth=auth,
+            verify=False)
+    
+    def post(self, url, headers=None, auth=None, data=None, files=None):
+        """Sends a POST request. data is either a dict of form fields
+        (sent as multipart/form-data along with files) or a string that
+        is sent as the request body.
+        """
+        return self._get_session().post(url, headers=headers, auth=auth,
+            data=data, files=files, verify=False)
+    
+    def close(self):
+        """Closes the sessions of all threads."""
+        with self._lock:
+            for holder in list(self._holders):
+                holder.session.close()
+            self._holders = weakref.WeakSet()
+            self._local = threading.local()
+    
+    def _get_session(self):
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            import requests
+            holder = _SessionHolder(requests.Session())
+            with self._lock:
+                self._holders.add(holder)
+                self._local.holder = holder
+        return holder.session
+
+
+class _SessionHolder(object):
+    # Only referenced from the thread-local storage of its thread, which
+    # is released when the thread exits; the session is closed with it
+    
+    def __init__(self, session):
+        self.session = session
+    
+    def __del__(self):
+        self.session.close()
+
+
+class Http2Transport(object):
+    """Transport that multiplexes requests over HTTP/2 connections.
+    
+    Based on httpx (https://www.python-httpx.org), which must be installed
+    with HTTP/2 support: pip install 'httpx[http2]'. Concurrent requests
+    issued from several threads share a few connections instead of opening
+    one socket each. Falls back to HTTP/1.1 for servers that do not
+    support HTTP/2.
+    
+    At most max_connections requests are in flight at any time; further
+    requests wait for one of them to finish. Over HTTP/1.1 every request
+    needs a connection of its own, and httpx fails requests that have to
+    queue for one when more threads than connections share the client.
+    
+    Arguments:
+    max_connections: maximum number of open connections to the API, and
+                     of concurrent requests
+    prior_knowledge: if True, speak HTTP/2 from the start without
+                     negotiating it; this also works over plain http://
+                     (h2c), but only with servers that support HTTP/2
+    """
+    
+    def __init__(self, max_connections=10, prior_knowledge=False):
+        self.max_connections = max_connections
+        self.prior_knowledge = prior_knowledge
+        self._client = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+    
+    def accept_encoding(self):
+        """Returns the value of the Accept-Encoding header: the content
+        codings that httpx decodes transparently, by preference. These
+        are gzip and deflate, br when brotli is installed and zstd when
+        zstandard is installed.
+        """
+        return _accept_encoding(
+            self._get_client().headers['Accept-Encoding'])
+    
+    def get(self, url, headers=None, auth=None):
+        client = self._get_client()
+        with self._slots:
+            return client.get(url, headers=headers, auth=auth)
+    
+    def post(self, url, headers=None, auth=None, data=None, files=None):
+        client = self._get_client()
+        with self._slots:
+            if isinstance(data, dict):
+                return client.post(url, headers=headers, auth=auth,
+                    data=data, files=files)
+            return client.post(url, headers=headers, auth=auth, content=data)
+    
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+    
+    def _get_client(self):
+        # The client is shared by all threads, so it must be created once
+        with self._lock:
+            if self._client is None:
+                import httpx
+                self._client = httpx.Client(http2=True, verify=False,
+                    http1=not self.prior_knowledge,
+                    limits=httpx.Limits(max_connections=self.max_connections))
+            return self._client
+
+
+class BlobStore(object):
+    """Content-addressed store for decision documents and attachments.
+    
+    Every file is stored once, under the SHA-256 digest of its contents
+    (<root>/<first two hex digits>/<digest>), so identical documents that
+    are downloaded or uploaded many times (standard annexes, re-published
+    PDFs) take up disk space only once. Files are stored as they are,
+    since PDF, docx and xlsx documents are already compressed.
+    
+    Arguments:
+    root: directory where the files are stored; created if missing
+    """
+    
+    CHUNK_SIZE = 64 * 1024
+    
+    def __init__(self, root):
+        self.root = root
+        if not os.path.isdir(root):
+            os.makedirs(root)
+    
+    def digest(self, fileobj):
+        """Returns the SHA-256 hex digest of the contents of fileobj, without
+        storing it. The file position of seekable files is restored
+        afterwards.
+        """
+        return self._copy(fileobj, None)
+    
+    def put(self, fileobj):
+        """Stores the contents of fileobj, unless an identical file is already
+        stored, and returns their digest. The file position of seekable
+        files is restored afterwards, so the same file handler can then be
+        uploaded; non-seekable streams are consumed.
+        
+        Seekable files are hashed first, so that files that are already
+        stored are not written again; non-seekable streams can only be
+        read once, so they are always copied to a temporary file.
+        """
+        if _seekable(fileobj):
+            digest = self._copy(fileobj, None)
+            if digest in self:
+                return digest
+        return self._save(lambda out: self._copy(fileobj, out))
+    
+    def put_bytes(self, data):
+        """Stores data (a byte string) and returns its digest."""
+        import hashlib
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self:
+            return digest
+        
+        def write(out):
+            out.write(data)
+            return digest
+        return self._save(write)
+    
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+    
+    def path(self, digest):
+        """Returns the path of the file with the specified digest."""
+        return os.path.join(self.root, digest[:2], digest)
+    
+    def open(self, digest):
+        """Opens the file with the specified digest for reading."""
+        return open(self.path(digest), 'rb')
+    
+    def _save(self, write):
+        # write(out) writes the contents to a temporary file and returns
+        # their digest; the file is then moved in place, or removed if an
+        # identical one is already stored (or if anything fails)
+        import tempfile
+        fd, tmp_path = tempfile.mkstemp(dir=self.root)
+        try:
+            out = os.fdopen(fd, 'wb')
+            try:
+                digest = write(out)
+            finally:
+                out.close()
+            if digest in self:
+                os.remove(tmp_path)
+            else:
+                self._makedirs(digest)
+                try:
+                    os.rename(tmp_path, self.path(digest))
+                except OSError:
+                    # Stored concurrently by another thread or process (on
+                    # Windows, rename fails if the target exists)
+                    if digest not in self:
+                        raise
+                    os.remove(tmp_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+    
+    def _makedirs(self, digest):
+        dirname = os.path.dirname(self.path(digest))
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # Created concurrently by another thread or process
+                if not os.path.isdir(dirname):
+                    raise
+    
+    def _copy(self, fileobj, out):
+        import hashlib
+        start = fileobj.tell() if _seekable(fileobj) else None
+        sha = hashlib.sha256()
+        try:
+            while True:
+                chunk = fileobj.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                if out is not None:
+                    out.write(chunk)
+        finally:
+            if start is not None:
+                fileobj.seek(start)
+        return sha.hexdigest()
+
+
+def _seekable(fileobj):
+    # Python 2 file objects have no seekable(), but can always seek
+    seekable = getattr(fileobj, 'seekable', None)
+    return seekable() if seekable is not None else hasattr(fileobj, 'seek')
+
 
 class OpendataClient(object):
     """Client operations for the Diavgeia Opendata API.
@@ -30,28 +331,60 @@ class OpendataClient(object):
     Read operations return a dict containing the JSON response data,
     while the write operations (submit_decision, edit_published_decision)
     return an instance of requests.Response (detailed description is here:
-    http://docs.python-requests.org/en/latest/api/#requests.Response).
+    http://docs.python-requests.org/en/latest/api/#requests.Response),
+    or the equivalent response object of the configured transport.
+    
+    A client can be shared by many threads, as long as its credentials are
+    given to the constructor (or obtained through with_credentials) rather
+    than changed with set_credentials/unset_credentials while other threads
+    use it. The caller's metadata dicts and file handlers are never
+    modified, apart from reading the files.
+    
+    Arguments:
+    root: API root URL
+    transport: object used to send the HTTP requests. Default:
+               a RequestsTransport; see also Http2Transport
+    store: BlobStore where every uploaded or downloaded document is
+           saved, if any; uploaded streams that are not seekable are
+           not saved, since they could not be sent afterwards
+    credentials: (username, password) tuple, if any
     """
     
-    def __init__(self, root=None):
+    def __init__(self, root=None, transport=None, store=None,
+                 credentials=None):
         self.root = root or 'https://test3.diavgeia.gov.gr/luminapi/opendata'
-        self.auth = False
-        self.username = None
-        self.password = None
+        self.transport = transport or RequestsTransport()
+        self.store = store
+        self._credentials = tuple(credentials) if credentials else None
         self.default_headers = {
             'Accept': 'application/json',
             'Connection': 'Keep-Alive'
         }
     
+    @property
+    def auth(self):
+        return self._credentials is not None
+    
+    @property
+    def username(self):
+        return self._credentials[0] if self._credentials else None
+    
+    @property
+    def password(self):
+        return self._credentials[1] if self._credentials else None
+    
+    def with_credentials(self, username, password):
+        """Returns a new client with the specified credentials, sharing
+        the transport and store of this one.
+        """
+        return OpendataClient(self.root, self.transport, self.store,
+                              (username, password))
+    
     def set_credentials(self, username, password):
-        self.auth = True
-        self.username = username
-        self.password = password
+        self._credentials = (username, password)
     
     def unset_credentials(self):
-        self.auth = False
-        self.username = None
-        self.password = None
+        self._credentials = None
     
     def get_dictionaries(self):
         """Returns the available dictionaries.
@@ -329,6 +662,20 @@ class OpendataClient(object):
         """
         return self._get_resource('/types/{0}/terms'.format(type_id))
     
+    def download_document(self, url):
+        """Downloads a decision document or attachment and returns its
+        contents. If the client has a store, the document is also saved
+        there, under the digest of its contents.
+        
+        Arguments:
+        url: document URL, e.g. the documentUrl field of a decision
+        """
+        response = self.transport.get(url, headers={'Accept': '*/*'})
+        response.raise_for_status()
+        if self.store is not None:
+            self.store.put_bytes(response.content)
+        return response.content
+    
     def submit_decision(self, metadata, pdf, attachments=[], recipients=[]):
         """Submits a new decision in Diavgeia.
         
@@ -349,7 +696,7 @@ class OpendataClient(object):
         sent when the decision is published
         """
         
-        self._add_recipients(metadata, recipients)
+        metadata = self._add_recipients(metadata, recipients)
         
         metadata_str = json.dumps(metadata)
         data = {'metadata': metadata_str}
@@ -361,8 +708,9 @@ class OpendataClient(object):
             for att in attachments:
                 files.append(('attachments', att[0]))
         
-        return requests.post(url=self._get_resource_url("/decisions"), 
-              data=data, files=tuple(files), verify=False,
+        self._store_files(files)
+        return self.transport.post(url=self._get_resource_url("/decisions"), 
+              data=data, files=tuple(files),
               auth=self._create_auth())
     
     
@@ -390,6 +738,7 @@ class OpendataClient(object):
         """
         
         if attachments_to_remove and not pdf and not attachments:
+            metadata = dict(metadata)
             metadata['attachments'] = {'remove': attachments_to_remove}
         
         metadata_str = json.dumps(metadata)
@@ -397,9 +746,9 @@ class OpendataClient(object):
         if not pdf and not attachments:
             headers = self.default_headers.copy()
             headers['Content-type'] = 'application/json'
-            response = requests.post(
+            response = self.transport.post(
                 url=self._get_resource_url("/decisions/" + ada), 
-                data=metadata_str, headers=headers, verify=False,
+                data=metadata_str, headers=headers,
                 auth=self._create_auth())
         else:
             data = {'metadata': metadata_str}
@@ -418,9 +767,10 @@ class OpendataClient(object):
             if attachments_to_remove:
                 data['attachmentsToRemove'] = json.dumps(attachments_to_remove)
             
-            response = requests.post(
+            self._store_files(files)
+            response = self.transport.post(
                 url=self._get_resource_url("/decisions/" + ada), 
-                data=data, files=files, verify=False,
+                data=data, files=files,
                 auth=self._create_auth())
         
         return response
@@ -438,9 +788,9 @@ class OpendataClient(object):
         request_str = json.dumps({'ada': ada, 'comment': comment})
         headers = self.default_headers.copy()
         headers['Content-type'] = 'application/json'
-        response = requests.post(
+        response = self.transport.post(
             url=self._get_resource_url("/decisions/requests/revocations"), 
-            data=request_str, headers=headers, verify=False, 
+            data=request_str, headers=headers,
             auth=self._create_auth())
         return response
     
@@ -448,27 +798,137 @@ class OpendataClient(object):
     ## PRIVATE
     
     def _add_recipients(self, metadata, recipients):
+        """Returns a copy of metadata including the notification action,
+        or metadata itself if there are no recipients."""
         if recipients and metadata['publish']:
+            metadata = dict(metadata)
             metadata['actions'] = [
                 {
                     'name': 'notifyRecipients',
                     'args': recipients
                 }
             ]
+        return metadata
+    
+    def _store_files(self, files):
+        if self.store is not None:
+            for _, fileobj in files:
+                if _seekable(fileobj):
+                    self.store.put(fileobj)
     
     def _get_resource(self, resource, addheaders={}):
         headers = self.default_headers.copy()
+        headers['Accept-Encoding'] = self.transport.accept_encoding()
         for addh in addheaders.keys():
             headers[addh] = addheaders[addh]
-        response = requests.get(self._get_resource_url(resource), 
+        response = self.transport.get(self._get_resource_url(resource), 
             auth=self._create_auth(),
-            headers=headers,
-            verify=False)
+            headers=headers)
         return response.json()
     
     def _get_resource_url(self, url_part):
         return self.root + ('' if url_part[0] == '/' else '/') + url_part
     
     def _create_auth(self):
-        return HTTPBasicAuth(self.username, self.password) if self.auth else None
+        # requests treats a (username, password) tuple as HTTP Basic auth
+        return self._credentials
+
+
+
+## COMMAND LINE INTERFACE
+
+def _print_json(data):
+    print(json.dumps(data, indent=2, sort_keys=True, ensure_ascii=False))
+
+def _print_response(response):
+    print('HTTP {0}'.format(response.status_code))
+    try:
+        _print_json(response.json())
+    except ValueError:
+        print(response.text)
+
+def main(argv=None):
+    """Entry point for ``python -m opendata``.
+    
+    Supports the most common operations: fetching a decision, simple
+    search, decision submission and revocation requests. Credentials
+    are read from the --username/--password options or from the
+    OPENDATA_USERNAME/OPENDATA_PASSWORD environment variables.
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='python -m opendata',
+        description='Client for the Diavgeia Opendata API.')
+    parser.add_argument('--root', help='API root URL')
+    parser.add_argument('--username',
+        default=os.environ.get('OPENDATA_USERNAME'))
+    parser.add_argument('--password',
+        default=os.environ.get('OPENDATA_PASSWORD'))
+    parser.add_argument('--http2', action='store_true',
+        help='use the HTTP/2 transport (requires httpx[http2])')
+    commands = parser.add_subparsers(dest='command')
+    
+    cmd = commands.add_parser('get-decision', help='show a decision')
+    cmd.add_argument('ada', help='decision identifier')
+    
+    cmd = commands.add_parser('search', help='simple decision search')
+    cmd.add_argument('criteria', nargs='*', metavar='NAME=VALUE',
+        help='search criteria, e.g. org=10599 size=5')
+    
+    cmd = commands.add_parser('submit', help='submit a new decision')
+    cmd.add_argument('metadata', help='JSON file with the decision metadata')
+    cmd.add_argument('pdf', help='decision document')
+    cmd.add_argument('--attachment', nargs=2, action='append', default=[],
+        metavar=('FILE', 'DESCRIPTION'), help='decision attachment')
+    
+    cmd = commands.add_parser('revoke', help='request decision revocation')
+    cmd.add_argument('ada', help='decision identifier')
+    cmd.add_argument('comment', help='reason for revocation')
+    
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error('a command is required')
+    if bool(args.username) != bool(args.password):
+        parser.error('--username and --password must be given together')
+    
+    client = OpendataClient(args.root,
+        Http2Transport() if args.http2 else None,
+        credentials=(args.username, args.password) if args.username else None)
+    
+    if args.command == 'get-decision':
+        result = client.get_decision(args.ada)
+        _print_json(result)
+        return 1 if 'errors' in result else 0
+    elif args.command == 'search':
+        for c in args.criteria:
+            if '=' not in c:
+                parser.error('invalid search criterion {0!r}, '
+                             'expected NAME=VALUE'.format(c))
+        criteria = dict(c.split('=', 1) for c in args.criteria)
+        result = client.get_simple_search_results(**criteria)
+        _print_json(result)
+        return 1 if 'errors' in result else 0
+    elif args.command == 'submit':
+        json_file = open(args.metadata, 'r')
+        metadata = json.load(json_file)
+        json_file.close()
+        pdf_file = open(args.pdf, 'rb')
+        attachments = [(open(f, 'rb'), descr) for f, descr in args.attachment]
+        try:
+            response = client.submit_decision(metadata, pdf_file, attachments)
+        finally:
+            pdf_file.close()
+            for att in attachments:
+                att[0].close()
+        _print_response(response)
+        return 0 if response.status_code == 200 else 1
+    elif args.command == 'revoke':
+        response = client.submit_revocation_request(args.ada, args.comment)
+        _print_response(response)
+        return 0 if response.status_code == 200 else 1
+    return 0
+
 
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+opendata_stub
+~~~~~~~~~~~~~
+
+A minimal local stand-in for the Diavgeia Opendata API, returning canned
+JSON responses. It is meant for tests, benchmarks and for trying out the
+client without touching the test server; it performs no validation apart
+from checking the credentials of write operations.
+
+Run it with ``python opendata_stub.py [port]`` and point the client to
+``http://127.0.0.1:<port>/luminapi/opendata``.
+
+Besides the HTTP/1.1 server, start_http2_stub serves the same API over
+cleartext HTTP/2 with prior knowledge (h2c), using the h2 package.
+
+"""
+
+import base64
+import gzip
+import io
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import zlib
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+ROOT_PATH = '/luminapi/opendata'
+
+# The only credentials accepted for write operations (same as the samples)
+CREDENTIALS = ('10599_api', 'User@10599')
+
+# Served as the document of every decision
+SAMPLE_DOCUMENT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    'SampleDecision.pdf')
+
+SAMPLE_DECISION = {
+    'ada': 'ΑΔΑ-STUB',
+    'versionId': 'v-stub',
+    'status': 'PUBLISHED',
+    'subject': 'ΑΠΟΦΑΣΗ ΑΝΑΛΗΨΗΣ ΥΠΟΧΡΕΩΣΗΣ',
+    'protocolNumber': '2014/1/001',
+    'organizationId': '10599',
+    'unitIds': ['10602'],
+    'signerIds': ['10911'],
+    'decisionTypeId': 'Β.1.3',
+    'thematicCategoryIds': ['20'],
+    'attachments': [],
+}
+
+SAMPLE_ORGANIZATION = {
+    'uid': '10599',
+    'label': 'ΔΟΚΙΜΑΣΤΙΚΟΣ ΦΟΡΕΑΣ',
+    'latinName': 'test',
+    'status': 'Active',
+    'category': 'MINISTRY',
+}
+
+
+def _decision(ada):
+    decision = dict(SAMPLE_DECISION)
+    decision['ada'] = ada
+    return decision
+
+
+def _search_results(page=0, size=10):
+    return {
+        'info': {'page': page, 'size': size, 'total': size, 'query': ''},
+        'decisions': [_decision('ΑΔΑ-{0}'.format(i)) for i in range(size)],
+    }
+
+
+def _error(code, message):
+    return {'errors': [{'errorCode': code, 'errorMessage': message}]}
+
+
+def _authorized(headers):
+    expected = base64.b64encode(
+        ':'.join(CREDENTIALS).encode('utf-8')).decode('ascii')
+    return headers.get('authorization') == 'Basic ' + expected
+
+
+def _gzip(body):
+    buf = io.BytesIO()
+    gz = gzip.GzipFile(fileobj=buf, mode='wb')
+    gz.write(body)
+    gz.close()
+    return buf.getvalue()
+
+
+def _brotli(body):
+    import brotli
+    return brotli.compress(body)
+
+
+def _zstd(body):
+    import zstandard
+    return zstandard.ZstdCompressor().compress(body)
+
+
+def _available_codings():
+    codings = {'gzip': _gzip, 'deflate': zlib.compress}
+    for name, module, compress in (('br', 'brotli', _brotli),
+                                   ('zstd', 'zstandard', _zstd)):
+        try:
+            __import__(module)
+            codings[name] = compress
+        except ImportError:
+            pass
+    return codings
+
+
+# Content codings the stub can produce, mapped to their compression
+# functions; br and zstd need the brotli and zstandard packages
+CODINGS = _available_codings()
+
+
+def _negotiate(accept_encoding, codings):
+    """Returns the accepted coding with the highest quality value."""
+    best, best_q = None, 0.0
+    for item in (accept_encoding or '').split(','):
+        params = item.strip().split(';')
+        name, q = params[0].strip().lower(), 1.0
+        for param in params[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                q = float(value)
+        if name in codings and q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _json_response(data, status, headers):
+    body = json.dumps(data).encode('utf-8')
+    response_headers = [('content-type', 'application/json')]
+    coding = _negotiate(headers.get('accept-encoding'), CODINGS)
+    if coding is not None:
+        body = CODINGS[coding](body)
+        response_headers.append(('content-encoding', coding))
+    return status, response_headers, body
+
+
+def respond(method, path, headers):
+    """Returns the (status, headers, body) response of the stub API for
+    a request. headers must be a dict with lower-case header names.
+    """
+    path, _, query = path.partition('?')
+    if method == 'GET' and path.startswith('/doc/'):
+        doc_file = open(SAMPLE_DOCUMENT, 'rb')
+        body = doc_file.read()
+        doc_file.close()
+        return 200, [('content-type', 'application/pdf')], body
+    if path.startswith(ROOT_PATH):
+        path = path[len(ROOT_PATH):]
+    path = path or '/'
+
+    if method == 'POST':
+        if not _authorized(headers):
+            return _json_response(_error('UNAUTHORIZED', path), 401, headers)
+        if path == '/decisions/requests/revocations':
+            return _json_response({'status': 'PENDING_REVOCATION'}, 200,
+                                  headers)
+        m = re.match(r'^/decisions(?:/([^/]+))?/?$', path)
+        if m:
+            return _json_response(_decision(m.group(1) or 'ΑΔΑ-NEW'), 200,
+                                  headers)
+        return _json_response(_error('NOT_FOUND', path), 404, headers)
+
+    params = dict(p.split('=', 1) for p in query.split('&') if '=' in p)
+    m = re.match(r'^/decisions/([^/]+)/?$', path)
+    if m:
+        decision = _decision(m.group(1))
+        decision['documentUrl'] = 'http://{0}/doc/{1}'.format(
+            headers.get('host'), m.group(1))
+        return _json_response(decision, 200, headers)
+    if path.startswith('/search'):
+        return _json_response(_search_results(
+            int(params.get('page', 0)), int(params.get('size', 10))),
+            200, headers)
+    if path == '/organizations':
+        return _json_response({'organizations': [SAMPLE_ORGANIZATION]}, 200,
+                              headers)
+    if path.startswith('/organizations/'):
+        return _json_response(SAMPLE_ORGANIZATION, 200, headers)
+    if path in ('/dictionaries', '/types', '/positions'):
+        return _json_response({}, 200, headers)
+    return _json_response(_error('NOT_FOUND', path), 404, headers)
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Serves the stub API over HTTP/1.1."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY every
+    # response would wait for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle(b'')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self._handle(self.rfile.read(length) if length else b'')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self, body):
+        headers = dict((k.lower(), v) for k, v in self.headers.items())
+        self.server.last_request = (self.command, self.path, headers, body)
+        status, response_headers, response_body = respond(
+            self.command, self.path, headers)
+        self.send_response(status)
+        for name, value in response_headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # (method, path, headers, body) of the most recent request
+    last_request = None
+
+
+def start_stub(port=0):
+    """Starts the stub in a background thread.
+
+    Returns a (server, root_url) tuple; call server.shutdown() to stop it.
+    """
+    server = StubServer(('127.0.0.1', port), StubRequestHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    root = 'http://127.0.0.1:{0}{1}'.format(server.server_address[1], ROOT_PATH)
+    return server, root
+
+
+class Http2StubServer(object):
+    """Serves the stub API over cleartext HTTP/2 (prior knowledge only).
+
+    Every request is answered from its own thread after the specified
+    delay, so several streams of a connection can be open at once;
+    connections and max_concurrent_streams count what the server saw.
+    """
+
+    def __init__(self, port=0, delay=0):
+        self.delay = delay
+        self.connections = 0
+        self.max_concurrent_streams = 0
+        self.last_request = None
+        self._open_streams = 0
+        self._stats_lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', port))
+        self._sock.listen(64)
+        self.server_address = self._sock.getsockname()
+        self._closed = False
+
+    def serve_forever(self):
+        while not self._closed:
+            try:
+                conn, _ = self._sock.accept()
+            except (socket.error, OSError):
+                break
+            with self._stats_lock:
+                self.connections += 1
+            thread = threading.Thread(target=self._serve_connection,
+                                      args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def shutdown(self):
+        self._closed = True
+        self._sock.close()
+
+    def _serve_connection(self, sock):
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(
+            client_side=False, header_encoding='utf-8'))
+        # Guards conn and the socket; notified when flow control windows grow
+        cond = threading.Condition()
+        streams = {}
+        with cond:
+            conn.initiate_connection()
+            sock.sendall(conn.data_to_send())
+        try:
+            while True:
+                data = sock.recv(65535)
+                if not data:
+                    break
+                with cond:
+                    events = conn.receive_data(data)
+                    for event in events:
+                        if isinstance(event, h2.events.RequestReceived):
+                            streams[event.stream_id] = [dict(event.headers), b'']
+                        elif isinstance(event, h2.events.DataReceived):
+                            streams[event.stream_id][1] += event.data
+                            conn.acknowledge_received_data(
+                                event.flow_controlled_length, event.stream_id)
+                        elif isinstance(event, h2.events.StreamEnded):
+                            headers, body = streams.pop(event.stream_id)
+                            thread = threading.Thread(target=self._respond,
+                                args=(conn, cond, sock, event.stream_id,
+                                      headers, body))
+                            thread.daemon = True
+                            thread.start()
+                        elif isinstance(event, h2.events.WindowUpdated):
+                            cond.notify_all()
+                    sock.sendall(conn.data_to_send())
+                    if any(isinstance(e, h2.events.ConnectionTerminated)
+                           for e in events):
+                        break
+        except (socket.error, OSError):
+            pass
+        finally:
+            sock.close()
+
+    def _respond(self, conn, cond, sock, stream_id, headers, body):
+        with self._stats_lock:
+            self._open_streams += 1
+            self.max_concurrent_streams = max(self.max_concurrent_streams,
+                                              self._open_streams)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            method, path = headers[':method'], headers[':path']
+            host = headers.get('host') or headers.get(':authority')
+            headers = dict((k, v) for k, v in headers.items()
+                           if not k.startswith(':'))
+            headers['host'] = host
+            self.last_request = (method, path, headers, body)
+            status, response_headers, response_body = respond(
+                method, path, headers)
+            with cond:
+                conn.send_headers(stream_id, [(':status', str(status))] +
+                    response_headers +
+                    [('content-length', str(len(response_body)))])
+                while True:
+                    size = min(conn.local_flow_control_window(stream_id),
+                               conn.max_outbound_frame_size,
+                               len(response_body))
+                    if size == 0 and response_body:
+                        sock.sendall(conn.data_to_send())
+                        cond.wait(1)
+                        continue
+                    conn.send_data(stream_id, response_body[:size],
+                                   end_stream=size == len(response_body))
+                    response_body = response_body[size:]
+                    if not response_body:
+                        break
+                sock.sendall(conn.data_to_send())
+        except (socket.error, OSError):
+            pass
+        finally:
+            with self._stats_lock:
+                self._open_streams -= 1
+
+
+def start_http2_stub(port=0, delay=0):
+    """Starts the HTTP/2 stub (see Http2StubServer) in a background thread.
+
+    Returns a (server, root_url) tuple; call server.shutdown() to stop it.
+    """
+    server = Http2StubServer(port, delay)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    root = 'http://127.0.0.1:{0}{1}'.format(server.server_address[1], ROOT_PATH)
+    return server, root
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    server = StubServer(('127.0.0.1', port), StubRequestHandler)
+    print('Serving on http://127.0.0.1:{0}{1}'.format(port, ROOT_PATH))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from opendata_stub import start_http2_stub, start_stub
+
+
+@pytest.fixture(scope='session')
+def stub():
+    """(server, root_url) of a local HTTP/1.1 opendata_stub server."""
+    server, root = start_stub()
+    yield server, root
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='session')
+def stub_root(stub):
+    return stub[1]
+
+
+@pytest.fixture(scope='session')
+def http2_stub():
+    """(server, root_url) of a local HTTP/2 (h2c) opendata_stub server."""
+    pytest.importorskip('h2')
+    server, root = start_http2_stub()
+    yield server, root
+    server.shutdown()
+
+
+@pytest.fixture
+def sample_file():
+    """Returns the absolute path of one of the sample files."""
+    return lambda name: os.path.join(ROOT_DIR, name)
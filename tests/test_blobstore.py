@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import io
+import json
+import os
+
+import pytest
+
+import opendata
+from opendata_stub import CREDENTIALS
+
+
+class NonSeekable(io.RawIOBase):
+    """Readable stream that cannot seek, like a pipe."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._data.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def _stored_files(store):
+    return [name for _, _, names in os.walk(store.root) for name in names]
+
+
+@pytest.fixture
+def store(tmpdir):
+    return opendata.BlobStore(str(tmpdir.join('store')))
+
+
+def test_put_deduplicates(store, sample_file):
+    digests = []
+    for _ in range(2):
+        att = open(sample_file('Attachment.docx'), 'rb')
+        digests.append(store.put(att))
+        att.close()
+    assert digests[0] == digests[1]
+    assert digests[0] in store
+    assert _stored_files(store) == [digests[0]]
+
+
+def test_put_known_file_is_not_written(store, monkeypatch):
+    digest = store.put(io.BytesIO(b'contents'))
+
+    def fail(write):
+        raise AssertionError('stored file written again')
+    monkeypatch.setattr(store, '_save', fail)
+    assert store.put(io.BytesIO(b'contents')) == digest
+
+
+def test_put_restores_position(store):
+    fileobj = io.BytesIO(b'header' + b'x' * 100000)
+    fileobj.read(6)
+    digest = store.put(fileobj)
+    assert fileobj.tell() == 6
+    assert digest == hashlib.sha256(b'x' * 100000).hexdigest()
+    stored = store.open(digest)
+    assert stored.read() == b'x' * 100000
+    stored.close()
+
+
+def test_put_bytes_matches_put(store):
+    digest = store.put_bytes(b'contents')
+    assert store.put(io.BytesIO(b'contents')) == digest
+    assert store.digest(io.BytesIO(b'contents')) == digest
+    assert _stored_files(store) == [digest]
+
+
+def test_put_bytes_cleans_up_on_failure(store, monkeypatch):
+    def fail(digest):
+        raise OSError('disk full')
+    monkeypatch.setattr(store, '_makedirs', fail)
+    with pytest.raises(OSError):
+        store.put_bytes(b'contents')
+    assert _stored_files(store) == []
+
+
+def test_put_cleans_up_on_failure(store):
+    class Broken(io.BytesIO):
+        def read(self, size=-1):
+            raise IOError('read error')
+    with pytest.raises(IOError):
+        store.put(Broken(b'contents'))
+    assert _stored_files(store) == []
+
+
+def test_put_stored_concurrently(store, monkeypatch):
+    def racing_rename(src, dst):
+        # Another thread stores the same file first; fail like Windows does
+        out = open(dst, 'wb')
+        out.write(b'contents')
+        out.close()
+        raise OSError('file exists')
+    monkeypatch.setattr(os, 'rename', racing_rename)
+    digest = store.put_bytes(b'contents')
+    assert digest in store
+    assert _stored_files(store) == [digest]
+
+
+def test_put_non_seekable(store):
+    digest = store.put(NonSeekable(b'contents'))
+    assert digest == hashlib.sha256(b'contents').hexdigest()
+
+
+def test_download_document_saves_into_store(store, stub_root, sample_file):
+    client = opendata.OpendataClient(stub_root, store=store)
+    document = client.download_document(
+        client.get_decision('ADA-1')['documentUrl'])
+    assert hashlib.sha256(document).hexdigest() in store
+    pdf_file = open(sample_file('SampleDecision.pdf'), 'rb')
+    assert store.digest(pdf_file) in store
+    pdf_file.close()
+
+
+def test_uploads_are_saved_into_store(store, stub_root, sample_file):
+    client = opendata.OpendataClient(stub_root, store=store,
+                                     credentials=CREDENTIALS)
+    json_file = open(sample_file('SampleDecisionMetadata.json'), 'r')
+    metadata = json.load(json_file)
+    json_file.close()
+    pdf_file = open(sample_file('SampleDecision.pdf'), 'rb')
+    att = open(sample_file('Attachment.docx'), 'rb')
+    try:
+        response = client.submit_decision(metadata, pdf_file,
+                                          [(att, 'Annex')])
+        assert response.status_code == 200
+        for fileobj in (pdf_file, att):
+            fileobj.seek(0)
+            assert store.digest(fileobj) in store
+    finally:
+        pdf_file.close()
+        att.close()
+
+
+def test_non_seekable_uploads_are_not_saved(store, stub_root):
+    client = opendata.OpendataClient(stub_root, store=store,
+                                     credentials=CREDENTIALS)
+    response = client.submit_decision({'publish': False},
+                                      NonSeekable(b'%PDF-1.4'))
+    assert response.status_code == 200
+    assert _stored_files(store) == []
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+import bench_startup
+import opendata
+
+
+def test_get_decision(stub_root, capsys):
+    assert opendata.main(['--root', stub_root, 'get-decision', 'ADA-1']) == 0
+    assert json.loads(capsys.readouterr().out)['ada'] == 'ADA-1'
+
+
+def test_get_decision_error_exit_status(stub_root, capsys):
+    assert opendata.main(['--root', stub_root + '/nope',
+                          'get-decision', 'ADA-1']) == 1
+    assert 'errors' in json.loads(capsys.readouterr().out)
+
+
+def test_search(stub_root, capsys):
+    assert opendata.main(['--root', stub_root, 'search', 'size=3']) == 0
+    assert len(json.loads(capsys.readouterr().out)['decisions']) == 3
+
+
+def test_search_invalid_criterion(stub_root, capsys):
+    with pytest.raises(SystemExit) as exc:
+        opendata.main(['--root', stub_root, 'search', 'badcriterion'])
+    assert exc.value.code == 2
+    assert 'NAME=VALUE' in capsys.readouterr().err
+
+
+def test_submit(stub_root, sample_file, capsys):
+    assert opendata.main([
+        '--root', stub_root, '--username', '10599_api',
+        '--password', 'User@10599',
+        'submit', sample_file('SampleDecisionMetadata.json'),
+        sample_file('SampleDecision.pdf'),
+        '--attachment', sample_file('Attachment.docx'), 'Attachment']) == 0
+    assert capsys.readouterr().out.startswith('HTTP 200')
+
+
+def test_revoke(stub_root, capsys):
+    assert opendata.main(['--root', stub_root, '--username', '10599_api',
+                          '--password', 'User@10599',
+                          'revoke', 'ADA-1', 'x']) == 0
+    assert 'PENDING_REVOCATION' in capsys.readouterr().out
+
+
+def test_bench_startup():
+    result = bench_startup.run(1)
+    assert result['runs'] == 1
+    assert result['lazy_import']
+    assert result['import_ms'] > 0
+
+
+@pytest.mark.parametrize('option', ['--username', '--password'])
+def test_credentials_must_be_given_together(stub_root, capsys, monkeypatch,
+                                            option):
+    monkeypatch.delenv('OPENDATA_USERNAME', raising=False)
+    monkeypatch.delenv('OPENDATA_PASSWORD', raising=False)
+    with pytest.raises(SystemExit) as exc:
+        opendata.main(['--root', stub_root, option, 'x',
+                       'revoke', 'ADA-1', 'x'])
+    assert exc.value.code == 2
+    assert '--username and --password' in capsys.readouterr().err
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import loadtest
+import opendata
+from opendata_stub import CREDENTIALS
+
+
+def _run(root, mix, **kwargs):
+    client = opendata.OpendataClient(root, credentials=CREDENTIALS)
+    # Import the HTTP library and connect before the clock starts, so that
+    # the first requests are not dropped on a slow machine
+    client.get_organization('10599')
+    options = dict(rate=200, duration=0.5, threads=4, interval=0.25)
+    options.update(kwargs)
+    return loadtest.run(client, loadtest.parse_mix(mix),
+                        report=lambda line: None, **options)
+
+
+def test_succeeded():
+    assert loadtest.succeeded({'ada': 'ADA-1'})
+    assert not loadtest.succeeded({'errors': []})
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert loadtest.percentile(values, 50) == 50
+    assert loadtest.percentile(values, 95) == 95
+    assert loadtest.percentile(values, 99) == 99
+    assert loadtest.percentile(values, 100) == 100
+    assert loadtest.percentile(list(range(1, 11)), 50) == 5
+    assert loadtest.percentile([7], 99) == 7
+    assert loadtest.percentile([], 99) == 0.0
+
+
+def test_all_operations(stub_root):
+    reports, totals, saturation = _run(stub_root, loadtest.DEFAULT_MIX)
+    assert sorted(totals) == sorted(loadtest.OPERATIONS)
+    assert all(t['errors'] == 0 for t in totals.values())
+    assert saturation['dropped'] == 0
+
+
+def test_read_errors_are_counted(stub_root):
+    _, totals, _ = _run(stub_root + '/nope',
+                        'get_decision=1,search=1,organization=1')
+    assert all(t['error_rate'] == 1.0 for t in totals.values())
+
+
+def test_tiny_interval(stub_root):
+    reports, _, _ = _run(stub_root, 'get_decision=1', interval=0.0001,
+                         duration=0.2)
+    assert reports
+
+
+def test_in_flight_requests_are_bounded(stub_root):
+    started = time.time()
+    reports, _, saturation = _run(stub_root, 'submit=1', rate=5000,
+                                  threads=1, max_in_flight=2, duration=0.5)
+    assert time.time() - started < 2
+    assert saturation['dropped'] > 0
+    assert max(r['pending'] for r in reports) <= 2
+
+
+def test_detect_leaks():
+    growing = [{'open_fds': 20 + i * 5, 'rss_mb': 30 + i * 10}
+               for i in range(9)]
+    flat = [{'open_fds': 20, 'rss_mb': 30} for _ in range(9)]
+    assert len(loadtest.detect_leaks(growing)) == 2
+    assert loadtest.detect_leaks(flat) == []
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import gc
+import os
+import threading
+import time
+
+import pytest
+
+import opendata
+from opendata_stub import CREDENTIALS
+
+
+def _open_fds():
+    return len(os.listdir('/proc/self/fd'))
+
+
+def _run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_sessions_closed_when_threads_exit(stub_root):
+    if not os.path.isdir('/proc/self/fd'):
+        pytest.skip('needs /proc to count open file descriptors')
+    transport = opendata.RequestsTransport()
+    client = opendata.OpendataClient(stub_root, transport)
+    client.get_decision('ADA-0')
+    before = _open_fds()
+
+    _run_threads(lambda: client.get_decision('ADA-1'), 50)
+    gc.collect()
+    assert len(transport._holders) == 1
+
+    # The stub closes its side of each connection asynchronously
+    for _ in range(50):
+        if _open_fds() - before < 5:
+            break
+        time.sleep(0.05)
+    assert _open_fds() - before < 5
+    transport.close()
+
+
+def test_close_closes_remaining_sessions(stub_root):
+    transport = opendata.RequestsTransport()
+    client = opendata.OpendataClient(stub_root, transport)
+    client.get_decision('ADA-0')
+    transport.close()
+    assert len(transport._holders) == 0
+    assert client.get_decision('ADA-1')['ada'] == 'ADA-1'
+
+
+def test_metadata_is_not_modified(stub_root, sample_file):
+    client = opendata.OpendataClient(stub_root, credentials=CREDENTIALS)
+    metadata = {'publish': True, 'subject': 'x'}
+    original = copy.deepcopy(metadata)
+    pdf_file = open(sample_file('SampleDecision.pdf'), 'rb')
+    try:
+        client.submit_decision(metadata, pdf_file, recipients=['a@b.gr'])
+    finally:
+        pdf_file.close()
+    client.edit_published_decision('ADA-1', metadata,
+                                   attachments_to_remove=['att-1'])
+    assert metadata == original
+
+
+def test_with_credentials(stub_root):
+    client = opendata.OpendataClient(stub_root)
+    authenticated = client.with_credentials(*CREDENTIALS)
+    assert not client.auth
+    assert authenticated.username == CREDENTIALS[0]
+    assert authenticated.transport is client.transport
+    assert authenticated.submit_revocation_request(
+        'ADA-1', 'x').status_code == 200
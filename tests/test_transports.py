@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+"""Conformance tests run against every transport."""
+
+import json
+import threading
+
+import pytest
+
+import opendata
+from opendata_stub import CODINGS, CREDENTIALS, start_http2_stub
+
+
+@pytest.fixture(params=['requests', 'httpx-http1', 'httpx-http2'])
+def endpoint(request):
+    """(transport, stub server, root_url) for each supported transport."""
+    if request.param == 'requests':
+        transport = opendata.RequestsTransport()
+        server, root = request.getfixturevalue('stub')
+    else:
+        pytest.importorskip('httpx')
+        if request.param == 'httpx-http1':
+            transport = opendata.Http2Transport()
+            server, root = request.getfixturevalue('stub')
+        else:
+            transport = opendata.Http2Transport(prior_knowledge=True)
+            server, root = request.getfixturevalue('http2_stub')
+    yield transport, server, root
+    transport.close()
+
+
+@pytest.fixture
+def client(endpoint):
+    transport, _, root = endpoint
+    return opendata.OpendataClient(root, transport, credentials=CREDENTIALS)
+
+
+@pytest.fixture
+def metadata(sample_file):
+    json_file = open(sample_file('SampleDecisionMetadata.json'), 'r')
+    metadata = json.load(json_file)
+    json_file.close()
+    return metadata
+
+
+def test_reads(client):
+    assert client.get_decision('ADA-1')['ada'] == 'ADA-1'
+    assert len(client.get_simple_search_results(size=3)['decisions']) == 3
+    assert client.get_organization('10599')['uid'] == '10599'
+
+
+def test_error_body(client):
+    assert 'errors' in client.get_unit('1')
+
+
+def test_accept_encoding_preference():
+    assert opendata._accept_encoding('gzip, deflate') == 'gzip, deflate;q=0.9'
+    assert (opendata._accept_encoding('gzip,deflate,br,zstd') ==
+            'zstd, br;q=0.9, gzip;q=0.8, deflate;q=0.7')
+
+
+def test_preferred_coding(endpoint):
+    transport, _, root = endpoint
+    accept_encoding = transport.accept_encoding()
+    preferred = accept_encoding.split(',')[0]
+    response = transport.get(root + '/search?size=50',
+        headers={'Accept-Encoding': accept_encoding})
+    assert response.headers['Content-Encoding'] == preferred
+    assert len(response.json()['decisions']) == 50
+
+
+@pytest.mark.parametrize('coding', opendata.CONTENT_CODINGS)
+def test_decodes_coding(endpoint, coding):
+    transport, _, root = endpoint
+    if coding not in transport.accept_encoding():
+        pytest.skip('{0} is not supported by this transport'.format(coding))
+    if coding not in CODINGS:
+        pytest.skip('{0} is not supported by the stub'.format(coding))
+    response = transport.get(root + '/search?size=50',
+        headers={'Accept-Encoding': coding})
+    assert response.headers['Content-Encoding'] == coding
+    assert len(response.json()['decisions']) == 50
+
+
+def test_auth(endpoint, client):
+    transport, server, root = endpoint
+    anonymous = opendata.OpendataClient(root, transport)
+    assert anonymous.submit_revocation_request('ADA-1', 'x').status_code == 401
+    assert client.submit_revocation_request('ADA-1', 'x').status_code == 200
+    assert server.last_request[2]['authorization'].startswith('Basic ')
+
+
+def test_submit_multipart(endpoint, client, metadata, sample_file):
+    server = endpoint[1]
+    pdf_file = open(sample_file('SampleDecision.pdf'), 'rb')
+    att = open(sample_file('Attachment.docx'), 'rb')
+    try:
+        response = client.submit_decision(metadata, pdf_file, [(att, 'Annex')])
+    finally:
+        pdf_file.close()
+        att.close()
+    assert response.status_code == 200
+    assert response.json()['ada'] == 'ΑΔΑ-NEW'
+    method, _, headers, body = server.last_request
+    assert method == 'POST'
+    assert headers['content-type'].startswith('multipart/form-data')
+    for name in (b'metadata', b'attachmentDescr', b'decisionFile',
+                 b'attachments'):
+        assert b'name="' + name + b'"' in body
+
+
+def test_edit_metadata_only(endpoint, client, metadata):
+    server = endpoint[1]
+    response = client.edit_published_decision('ADA-1', metadata,
+        attachments_to_remove=['att-1'])
+    assert response.status_code == 200
+    _, path, headers, body = server.last_request
+    assert path.endswith('/decisions/ADA-1')
+    assert headers['content-type'] == 'application/json'
+    assert json.loads(body.decode('utf-8'))['attachments'] == {
+        'remove': ['att-1']}
+
+
+def test_download_document(client, sample_file):
+    document = client.download_document(
+        client.get_decision('ADA-1')['documentUrl'])
+    pdf_file = open(sample_file('SampleDecision.pdf'), 'rb')
+    assert document == pdf_file.read()
+    pdf_file.close()
+
+
+def test_close_and_reuse(endpoint, client):
+    endpoint[0].close()
+    assert client.get_decision('ADA-2')['ada'] == 'ADA-2'
+
+
+def test_concurrent_reads(client):
+    results = {}
+
+    def read(i):
+        results[i] = client.get_decision('ADA-{0}'.format(i))['ada']
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == dict((i, 'ADA-{0}'.format(i)) for i in range(8))
+
+
+def test_more_threads_than_connections(endpoint):
+    transport, _, root = endpoint
+    if isinstance(transport, opendata.Http2Transport):
+        transport = opendata.Http2Transport(max_connections=2,
+            prior_knowledge=transport.prior_knowledge)
+    client = opendata.OpendataClient(root, transport)
+    errors = []
+
+    def read(i):
+        try:
+            client.get_decision('ADA-{0}'.format(i))
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        for _ in range(5):
+            threads = [threading.Thread(target=read, args=(i,))
+                       for i in range(16)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        transport.close()
+    assert errors == []
+
+
+def test_http2_multiplexing():
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    # Every response is delayed, so that the streams overlap
+    server, root = start_http2_stub(delay=0.2)
+    transport = opendata.Http2Transport(prior_knowledge=True)
+    versions = []
+    lock = threading.Lock()
+
+    def read(i):
+        response = transport.get(root + '/decisions/ADA-{0}'.format(i))
+        with lock:
+            versions.append(response.http_version)
+
+    try:
+        threads = [threading.Thread(target=read, args=(i,))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        transport.close()
+        server.shutdown()
+    assert versions == ['HTTP/2'] * 8
+    assert server.connections == 1
+    assert server.max_concurrent_streams > 1